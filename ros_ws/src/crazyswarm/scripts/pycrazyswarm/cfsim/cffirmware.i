@@ -5,6 +5,7 @@
 
 %{
 #define SWIG_FILE_WITH_INIT
+#include <math.h>
 #include "collision_avoidance.h"
 #include "math3d.h"
 #include "pptraj.h"
@@ -25,7 +26,25 @@
     import_array()
 %}
 
-%apply (int DIM1, float* IN_ARRAY1) {(int nOthers, float const *otherPositions)}
+%apply (int DIM1, float* IN_ARRAY1) {(int nOthers, float const *otherPositions),
+                                     (int nAll, float const *allPositions),
+                                     (int nPos, float const *pos),
+                                     (int nVel, float const *vel),
+                                     (int nYaw, float const *yaw),
+                                     (int nSetPos, float const *setPos),
+                                     (int nSetVel, float const *setVel),
+                                     (int nSetAcc, float const *setAcc),
+                                     (int nSetYaw, float const *setYaw),
+                                     (int nSetOmegaZ, float const *setOmegaZ),
+                                     (int nNoise, float const *noise)}
+%apply (int DIM1, double* IN_ARRAY1) {(int nCoefs, double const *coefs),
+                                      (int nPieces, double const *durations)}
+%apply (int DIM1, long long* IN_ARRAY1) {(int nModes, long long const *modes)}
+%apply (int DIM1, float* INPLACE_ARRAY1) {(int nOutPos, float *outPos),
+                                          (int nOutVel, float *outVel),
+                                          (int nOutAcc, float *outAcc),
+                                          (int nOutYaw, float *outYaw),
+                                          (int nOutOmegaZ, float *outOmegaZ)}
 
 %inline %{
 void poly4d_set(struct poly4d *poly, int dim, int coef, float val)
@@ -40,6 +59,25 @@ struct poly4d* pp_get_piece(struct piecewise_traj *pp, int i)
 {
     return &pp->pieces[i];
 }
+// Bulk setter for an entire piecewise trajectory. coefs is a flattened
+// [nPieces, 4, 8] coefficient array and durations has one entry per piece,
+// so a single call replaces the 32 poly4d_set calls per piece that a Python
+// loop would make.
+void poly4d_set_all(struct piecewise_traj *pp,
+                    int nCoefs, double const *coefs,
+                    int nPieces, double const *durations)
+{
+    int i, d, c;
+    for (i = 0; i < nPieces; ++i) {
+        struct poly4d *piece = &pp->pieces[i];
+        piece->duration = durations[i];
+        for (d = 0; d < 4; ++d) {
+            for (c = 0; c < 8; ++c) {
+                piece->p[d][c] = coefs[(i * 4 + d) * 8 + c];
+            }
+        }
+    }
+}
 struct poly4d* malloc_poly4d(int size)
 {
     return (struct poly4d*)malloc(sizeof(struct poly4d) * size);
@@ -56,6 +94,129 @@ struct vec3_s svec2vec(struct vec v)
   return vv;
 }
 
+// In-place variants of the conversions above, so per-tick code can reuse
+// persistent objects instead of allocating a new SWIG wrapper per call.
+void copy_svec_to_vec(struct vec3_s *dst, struct vec src)
+{
+  dst->x = src.x;
+  dst->y = src.y;
+  dst->z = src.z;
+}
+
+void copy_vec_to_svec(struct vec *dst, struct vec3_s src)
+{
+  dst->x = src.x;
+  dst->y = src.y;
+  dst->z = src.z;
+}
+
+// Copy only the fields of a trajectory evaluation that the simulator does
+// not overwrite right after (acc, yaw, omega). Lets the per-tick back-buffer
+// update reuse its existing traj_eval instead of allocating a full copy and
+// then clobbering pos and vel anyway.
+void traj_eval_copy_kinematic(struct traj_eval *dst, struct traj_eval const *src)
+{
+  dst->acc = src->acc;
+  dst->yaw = src->yaw;
+  dst->omega = src->omega;
+}
+
+// Flight modes of the simulated Crazyflie. Must match the MODE_* constants
+// in pycrazyswarm/crazyflieSim.py.
+enum sim_mode_e {
+    SIM_MODE_IDLE = 0,
+    SIM_MODE_HIGH_POLY = 1,
+    SIM_MODE_LOW_FULLSTATE = 2,
+    SIM_MODE_LOW_POSITION = 3,
+    SIM_MODE_LOW_VELOCITY = 4,
+    SIM_MODE_LOW_ACCELERATION = 5,
+};
+
+// Batched integration of the simple (non-collision-avoidance) flight modes
+// for the whole swarm: velocity command, norm clamp, disturbance, Euler
+// position update and yaw handling in one crossing of the Python/C boundary
+// per tick. All arrays are float32 structure-of-arrays indexed by CF; the
+// 3-vector arrays are flattened [N, 3]. Rows whose mode is SIM_MODE_IDLE are
+// skipped. Mirrors _integrateKernel in pycrazyswarm/crazyflieSim.py.
+void integrate_all_cfs(
+    double dt, double maxVel, double disturbanceSize,
+    int nModes, long long const *modes,
+    int nPos, float const *pos,
+    int nVel, float const *vel,
+    int nYaw, float const *yaw,
+    int nSetPos, float const *setPos,
+    int nSetVel, float const *setVel,
+    int nSetAcc, float const *setAcc,
+    int nSetYaw, float const *setYaw,
+    int nSetOmegaZ, float const *setOmegaZ,
+    int nNoise, float const *noise,
+    int nOutPos, float *outPos,
+    int nOutVel, float *outVel,
+    int nOutAcc, float *outAcc,
+    int nOutYaw, float *outYaw,
+    int nOutOmegaZ, float *outOmegaZ)
+{
+    int i;
+    // No-op pragma unless the extension is compiled with OpenMP enabled.
+    #ifdef _OPENMP
+    #pragma omp parallel for
+    #endif
+    for (i = 0; i < nModes; ++i) {
+        // Everything per-iteration lives inside the loop body so each
+        // OpenMP thread gets its own copy; only i is privatized by the
+        // pragma itself.
+        long long mode = modes[i];
+        int k;
+        double v[3];
+        double norm2, scale;
+        if (mode == SIM_MODE_IDLE) {
+            continue;
+        }
+
+        if (mode == SIM_MODE_HIGH_POLY || mode == SIM_MODE_LOW_POSITION) {
+            for (k = 0; k < 3; ++k) {
+                v[k] = (setPos[3*i + k] - pos[3*i + k]) / dt;
+            }
+        } else if (mode == SIM_MODE_LOW_FULLSTATE || mode == SIM_MODE_LOW_VELOCITY) {
+            for (k = 0; k < 3; ++k) {
+                v[k] = setVel[3*i + k];
+            }
+        } else {  // SIM_MODE_LOW_ACCELERATION
+            for (k = 0; k < 3; ++k) {
+                v[k] = vel[3*i + k] + dt * setAcc[3*i + k];
+            }
+        }
+
+        norm2 = v[0]*v[0] + v[1]*v[1] + v[2]*v[2];
+        if (norm2 > maxVel * maxVel) {
+            scale = maxVel / sqrt(norm2);
+            for (k = 0; k < 3; ++k) {
+                v[k] *= scale;
+            }
+        }
+
+        for (k = 0; k < 3; ++k) {
+            v[k] += disturbanceSize * noise[3*i + k];
+            outPos[3*i + k] = pos[3*i + k] + dt * v[k];
+            outVel[3*i + k] = v[k];
+            outAcc[3*i + k] = (mode == SIM_MODE_LOW_ACCELERATION)
+                ? setAcc[3*i + k]
+                : (v[k] - vel[3*i + k]) / dt;
+        }
+
+        if (mode == SIM_MODE_LOW_POSITION) {
+            outYaw[i] = setYaw[i];
+            outOmegaZ[i] = (setYaw[i] - yaw[i]) / dt;
+        } else if (mode == SIM_MODE_LOW_VELOCITY) {
+            outYaw[i] = setYaw[i] + dt * setOmegaZ[i];
+            outOmegaZ[i] = setOmegaZ[i];
+        } else {
+            outYaw[i] = setYaw[i];
+            outOmegaZ[i] = setOmegaZ[i];
+        }
+    }
+}
+
 void collisionAvoidanceUpdateSetpointWrap(
   collision_avoidance_params_t const *params,
   collision_avoidance_state_t *collisionState,
@@ -75,6 +236,42 @@ void collisionAvoidanceUpdateSetpointWrap(
     );
     free(workspace);
 }
+
+// Variant taking the positions of the whole swarm plus the index of the CF
+// being updated. Avoids the per-CF Python-side compaction copy: the caller
+// can pass the shared swarm position cache as-is and we drop the CF's own
+// row while compacting into the workspace here.
+void collisionAvoidanceUpdateSetpointWrap_skip(
+  collision_avoidance_params_t const *params,
+  collision_avoidance_state_t *collisionState,
+  int nAll, float const *allPositions,
+  int skipIndex,
+  setpoint_t *setpoint, sensorData_t const *sensorData, state_t const *state)
+{
+    int n = nAll / 3;
+    int i, nOthers = 0;
+    float *buf = malloc(sizeof(float) * (3 * n + 7 * (n + 6)));
+    float *others = buf;
+    float *workspace = buf + 3 * n;
+    for (i = 0; i < n; ++i) {
+        if (i == skipIndex) {
+            continue;
+        }
+        others[3 * nOthers + 0] = allPositions[3 * i + 0];
+        others[3 * nOthers + 1] = allPositions[3 * i + 1];
+        others[3 * nOthers + 2] = allPositions[3 * i + 2];
+        ++nOthers;
+    }
+    collisionAvoidanceUpdateSetpointCore(
+        params,
+        collisionState,
+        nOthers,
+        others,
+        workspace,
+        setpoint, sensorData, state
+    );
+    free(buf);
+}
 %}
 
 
@@ -1,13 +1,204 @@
 #!/usr/bin/env python
 
+import functools
 import math
+import os
 
 import yaml
 import numpy as np
-from scipy.spatial.transform import Rotation
+
+try:
+    # The libyaml-backed loader is around 10x faster than the pure-Python
+    # one; not all PyYAML installs ship it.
+    from yaml import CSafeLoader as _YamlSafeLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlSafeLoader
 
 from .cfsim import cffirmware as firm
 
+try:
+    from numba import njit, prange
+except ImportError:
+    # Numba is optional - the kernels below are plain Python/NumPy too, just
+    # without the compiled speedup.
+    def njit(*args, **kwargs):
+        def passthrough(func):
+            return func
+        return passthrough
+    prange = range
+
+
+# Flight-mode constants. Mirrored as Crazyflie.MODE_* class attributes; the
+# module-level names exist because Numba's nopython mode cannot read class
+# attributes inside the integration kernel.
+_MODE_IDLE = 0
+_MODE_HIGH_POLY = 1
+_MODE_LOW_FULLSTATE = 2
+_MODE_LOW_POSITION = 3
+_MODE_LOW_VELOCITY = 4
+_MODE_LOW_ACCELERATION = 5
+
+# Modes that the batched integration kernel understands. IDLE and unknown
+# modes (and any CF with collision avoidance enabled) take the per-CF
+# Crazyflie.integrate() path instead.
+_KERNEL_MODES = (
+    _MODE_HIGH_POLY,
+    _MODE_LOW_FULLSTATE,
+    _MODE_LOW_POSITION,
+    _MODE_LOW_VELOCITY,
+    _MODE_LOW_ACCELERATION,
+)
+
+# Native batched integrator from the sim extension - one Python/C crossing
+# per tick for the whole swarm. getattr so a cffirmware built before the
+# helper existed still works, via the Python kernel below.
+_integrateAllC = getattr(firm, "integrate_all_cfs", None)
+
+# Collision-avoidance entrypoint that takes the whole swarm's positions plus
+# a skip index, so CFs avoiding everyone else need no per-CF gather copy.
+_caWrapSkip = getattr(firm, "collisionAvoidanceUpdateSetpointWrap_skip", None)
+
+# In-place partial copy (acc/yaw/omega only) for the back-buffer update in
+# Crazyflie.integrate(), replacing a full traj_eval allocation per tick.
+_trajEvalCopyKinematic = getattr(firm, "traj_eval_copy_kinematic", None)
+
+# In-place vec <-> vec3_s conversions for the collision-avoidance path. The
+# componentwise Python fallback is slower but keeps old extensions working.
+_copySvecToVec = getattr(firm, "copy_svec_to_vec", None)
+_copyVecToSvec = getattr(firm, "copy_vec_to_svec", None)
+if _copySvecToVec is None:
+    def _copyVec3Components(dst, src):
+        dst.x = src.x
+        dst.y = src.y
+        dst.z = src.z
+    _copySvecToVec = _copyVec3Components
+    _copyVecToSvec = _copyVec3Components
+
+# Bulk trajectory upload; None means uploadTrajectory falls back to the
+# per-coefficient poly4d_set loop.
+_poly4dSetAll = getattr(firm, "poly4d_set_all", None)
+
+
+@njit(cache=True, parallel=True)
+def _integrateKernel(dt, maxVel, disturbanceSize, modes, pos, vel, yaw,
+                     setPos, setVel, setAcc, setYaw, setOmegaZ,
+                     noise, outPos, outVel, outAcc, outYaw, outOmegaZ):
+    """Batched version of the simple branches of Crazyflie.integrate().
+
+    Operates on SoA arrays indexed by Crazyflie.index so the whole swarm is
+    advanced in one pass of contiguous float math instead of N Python-level
+    dispatches with SWIG roundtrips. Rows whose mode is _MODE_IDLE are
+    skipped; the per-CF path has already handled those CFs.
+    """
+    for i in prange(len(modes)):
+        mode = modes[i]
+        if mode == _MODE_IDLE:
+            continue
+
+        if mode == _MODE_HIGH_POLY or mode == _MODE_LOW_POSITION:
+            vx = (setPos[i, 0] - pos[i, 0]) / dt
+            vy = (setPos[i, 1] - pos[i, 1]) / dt
+            vz = (setPos[i, 2] - pos[i, 2]) / dt
+        elif mode == _MODE_LOW_FULLSTATE or mode == _MODE_LOW_VELOCITY:
+            vx = setVel[i, 0]
+            vy = setVel[i, 1]
+            vz = setVel[i, 2]
+        else:  # _MODE_LOW_ACCELERATION
+            vx = vel[i, 0] + dt * setAcc[i, 0]
+            vy = vel[i, 1] + dt * setAcc[i, 1]
+            vz = vel[i, 2] + dt * setAcc[i, 2]
+
+        # Limit velocity for realism. Same caveats as in integrate().
+        norm2 = vx * vx + vy * vy + vz * vz
+        if norm2 > maxVel * maxVel:
+            scale = maxVel / math.sqrt(norm2)
+            vx *= scale
+            vy *= scale
+            vz *= scale
+
+        vx += disturbanceSize * noise[i, 0]
+        vy += disturbanceSize * noise[i, 1]
+        vz += disturbanceSize * noise[i, 2]
+
+        outPos[i, 0] = pos[i, 0] + dt * vx
+        outPos[i, 1] = pos[i, 1] + dt * vy
+        outPos[i, 2] = pos[i, 2] + dt * vz
+        outVel[i, 0] = vx
+        outVel[i, 1] = vy
+        outVel[i, 2] = vz
+
+        if mode == _MODE_LOW_ACCELERATION:
+            outAcc[i, 0] = setAcc[i, 0]
+            outAcc[i, 1] = setAcc[i, 1]
+            outAcc[i, 2] = setAcc[i, 2]
+        else:
+            outAcc[i, 0] = (vx - vel[i, 0]) / dt
+            outAcc[i, 1] = (vy - vel[i, 1]) / dt
+            outAcc[i, 2] = (vz - vel[i, 2]) / dt
+
+        if mode == _MODE_LOW_POSITION:
+            outYaw[i] = setYaw[i]
+            outOmegaZ[i] = (setYaw[i] - yaw[i]) / dt
+        elif mode == _MODE_LOW_VELOCITY:
+            outYaw[i] = setYaw[i] + dt * setOmegaZ[i]
+            outOmegaZ[i] = setOmegaZ[i]
+        else:
+            # HIGH_POLY and LOW_FULLSTATE inherit yaw and omega from the
+            # setState copy; these outputs are unused.
+            outYaw[i] = setYaw[i]
+            outOmegaZ[i] = setOmegaZ[i]
+
+
+@njit(cache=True)
+def _vclampnorm3(vx, vy, vz, maxVel):
+    # Scalar equivalent of firm.vclampnorm, saving a SWIG roundtrip per CF
+    # per tick whenever a finite maxVel is configured.
+    norm2 = vx * vx + vy * vy + vz * vz
+    if norm2 <= maxVel * maxVel:
+        return (vx, vy, vz)
+    scale = maxVel / math.sqrt(norm2)
+    return (vx * scale, vy * scale, vz * scale)
+
+
+@njit(cache=True)
+def _accYawToRPY(ax, ay, az, yaw):
+    # Scalar expansion of the norm/cross math in Crazyflie.rpy(). For
+    # 3-vectors, np.linalg.norm and np.cross are dominated by Python dispatch
+    # overhead, and this runs twice per CF per tick.
+    norm2 = ax * ax + ay * ay + az * az
+    if norm2 < 1e-12:
+        return (0.0, 0.0, yaw)
+    tx = ax
+    ty = ay
+    tz = az + 9.81
+    tnorm = math.sqrt(tx * tx + ty * ty + tz * tz)
+    zbx = tx / tnorm
+    zby = ty / tnorm
+    zbz = tz / tnorm
+    cy, sy = math.cos(yaw), math.sin(yaw)
+    # y_body = z_body x x_world, with x_world = (cos yaw, sin yaw, 0).
+    ybx = -zbz * sy
+    yby = zbz * cy
+    ybz = zbx * sy - zby * cy
+    # Only the z component of x_body = y_body x z_body is needed.
+    xbz = ybx * zby - yby * zbx
+    pitch = math.asin(-xbz)
+    roll = math.atan2(ybz, zbz)
+    return (roll, pitch, yaw)
+
+
+@njit(cache=True)
+def _bodyZAxis(roll, pitch, yaw):
+    # Third column of the extrinsic-xyz rotation matrix Rz(yaw) Ry(pitch)
+    # Rx(roll), i.e. the body z axis in world coordinates. Angles in radians.
+    cr, sr = math.cos(roll), math.sin(roll)
+    cp, sp = math.cos(pitch), math.sin(pitch)
+    cy, sy = math.cos(yaw), math.sin(yaw)
+    return (cy * sp * cr + sy * sr,
+            sy * sp * cr - cy * sr,
+            cp * cr)
+
+
 # main class of simulation.
 # crazyflies keep reference to this object to ask what time it is.
 # also does the plotting.
@@ -32,6 +223,14 @@ class TimeHelper:
         # "leftover" time. Keep track of it here and add extra ticks in future.
         self.sleepResidual = 0.0
         self.crazyflies = []
+        self._rng = np.random.default_rng()
+        self._positionsFresh = False
+        # Swarm-level structure-of-arrays state, refreshed once per step().
+        # Each read of cf.state.pos.{x,y,z} crosses the SWIG boundary, so
+        # gathering everything in a single pass saves collision avoidance from
+        # doing O(N^2) attribute accesses per tick and feeds the batched
+        # integration kernel.
+        self._allocArrays(0)
         self.disturbanceSize = disturbanceSize
         self.maxVel = maxVel
         if writecsv:
@@ -43,32 +242,198 @@ class TimeHelper:
     def time(self):
         return self.t
 
+    def _allocArrays(self, n):
+        # SoA arrays for the batched integration kernel, all indexed by
+        # Crazyflie.index. Everything is float32: the firmware does all its
+        # math in single precision anyway, and halving the bytes per row
+        # keeps the per-tick SoA scans cache-friendly for large swarms.
+        self.positions = np.empty((n, 3), dtype=np.float32)
+        self._statePos = np.empty((n, 3), dtype=np.float32)
+        self._stateVel = np.empty((n, 3), dtype=np.float32)
+        self._stateYaw = np.empty(n, dtype=np.float32)
+        self._setPos = np.zeros((n, 3), dtype=np.float32)
+        self._setVel = np.zeros((n, 3), dtype=np.float32)
+        self._setAcc = np.zeros((n, 3), dtype=np.float32)
+        self._setYaw = np.zeros(n, dtype=np.float32)
+        self._setOmegaZ = np.zeros(n, dtype=np.float32)
+        self._modes = np.zeros(n, dtype=np.int64)
+        self._outPos = np.empty((n, 3), dtype=np.float32)
+        self._outVel = np.empty((n, 3), dtype=np.float32)
+        self._outAcc = np.empty((n, 3), dtype=np.float32)
+        self._outYaw = np.empty(n, dtype=np.float32)
+        self._outOmegaZ = np.empty(n, dtype=np.float32)
+        self._noiseBuf = np.zeros((n, 3), dtype=np.float32)
+
+    def _refreshPositions(self):
+        # One pass of direct attribute reads per tick. The rows are indexed by
+        # Crazyflie.index, assigned in CrazyflieServer.__init__. Refreshing
+        # before integration means all CFs observe the same world state within
+        # a tick, matching the double-buffering intent. The freshness flag
+        # avoids a second pass when sleep() has already refreshed for the
+        # visualizer and no integration has happened since.
+        if len(self.positions) != len(self.crazyflies):
+            self._allocArrays(len(self.crazyflies))
+        elif self._positionsFresh:
+            return
+        for i, cf in enumerate(self.crazyflies):
+            pos = cf.state.pos
+            vel = cf.state.vel
+            self.positions[i, 0] = pos.x
+            self.positions[i, 1] = pos.y
+            self.positions[i, 2] = pos.z
+            self._statePos[i, 0] = pos.x
+            self._statePos[i, 1] = pos.y
+            self._statePos[i, 2] = pos.z
+            self._stateVel[i, 0] = vel.x
+            self._stateVel[i, 1] = vel.y
+            self._stateVel[i, 2] = vel.z
+            self._stateYaw[i] = cf.state.yaw
+        self._positionsFresh = True
+
+    def _syncSetState(self, cf):
+        # Copy a CF's setState into its SoA row. Only called when the setState
+        # actually changed (cmd* call or fresh planner evaluation), so CFs
+        # holding a static setpoint cost nothing here.
+        i = cf.index
+        pos = cf.setState.pos
+        vel = cf.setState.vel
+        acc = cf.setState.acc
+        self._setPos[i, 0] = pos.x
+        self._setPos[i, 1] = pos.y
+        self._setPos[i, 2] = pos.z
+        self._setVel[i, 0] = vel.x
+        self._setVel[i, 1] = vel.y
+        self._setVel[i, 2] = vel.z
+        self._setAcc[i, 0] = acc.x
+        self._setAcc[i, 1] = acc.y
+        self._setAcc[i, 2] = acc.z
+        self._setYaw[i] = cf.setState.yaw
+        self._setOmegaZ[i] = cf.setState.omega.z
+        cf._setStateDirty = False
+
     def step(self, duration):
         self.t += duration
-        #for cf in self.crazyflies:
-
+        self._refreshPositions()
+
+        # One bulk draw per tick instead of a 3-element allocation (and a
+        # global-RNG lock acquisition) per CF. The buffer stays zero when
+        # there is no disturbance to simulate.
+        if self.disturbanceSize != 0.0:
+            self._rng.standard_normal(out=self._noiseBuf, dtype=np.float32)
+
+        # Partition the swarm: CFs with collision avoidance enabled, IDLE CFs
+        # and unknown modes take the per-CF integrate() path; everything else
+        # is advanced in one batched kernel call over the SoA arrays.
+        kernelCFs = []
         for cf in self.crazyflies:
-            cf.integrate(duration, self.disturbanceSize, self.maxVel)
-            roll_prev, pitch_prev, _ = np.array(cf.rpy())
-            cf.flip()
-            cf.state.euler = np.array(cf.rpy())
-            omega = np.array([(roll_prev - cf.state.euler[0])/duration, (pitch_prev - cf.state.euler[1])/duration,
-                              cf.state.omega[2]])
-            cf.state.omega = firm.mkvec(*omega)
+            if cf.mode == _MODE_IDLE and cf.collisionAvoidanceState is None:
+                # Nothing to integrate and nothing moved: skip the attitude
+                # bookkeeping and the buffer flip entirely.
+                self._modes[cf.index] = _MODE_IDLE
+                continue
+            if cf.collisionAvoidanceState is not None or cf.mode not in _KERNEL_MODES:
+                cf.integrate(duration, self.disturbanceSize, self.maxVel)
+                self._modes[cf.index] = _MODE_IDLE
+                self._finishTick(cf, duration)
+                continue
+            if cf.mode == _MODE_HIGH_POLY:
+                cf.setState = firm.plan_current_goal(cf.planner, self.t)
+                cf._setStateDirty = True
+            if cf._setStateDirty:
+                self._syncSetState(cf)
+            self._modes[cf.index] = cf.mode
+            kernelCFs.append(cf)
+
+        if kernelCFs:
+            if _integrateAllC is not None:
+                _integrateAllC(
+                    duration, self.maxVel, self.disturbanceSize, self._modes,
+                    self._statePos.ravel(), self._stateVel.ravel(),
+                    self._stateYaw,
+                    self._setPos.ravel(), self._setVel.ravel(),
+                    self._setAcc.ravel(),
+                    self._setYaw, self._setOmegaZ, self._noiseBuf.ravel(),
+                    self._outPos.ravel(), self._outVel.ravel(),
+                    self._outAcc.ravel(),
+                    self._outYaw, self._outOmegaZ)
+            else:
+                _integrateKernel(
+                    duration, self.maxVel, self.disturbanceSize, self._modes,
+                    self._statePos, self._stateVel, self._stateYaw,
+                    self._setPos, self._setVel, self._setAcc,
+                    self._setYaw, self._setOmegaZ, self._noiseBuf,
+                    self._outPos, self._outVel, self._outAcc,
+                    self._outYaw, self._outOmegaZ)
+            for cf in kernelCFs:
+                self._writeBack(cf, duration)
+
+        self._positionsFresh = False
+
+    def _writeBack(self, cf, duration):
+        # Scatter the kernel outputs for one CF. Because the kernel consumed
+        # a snapshot of the whole swarm, the results can go straight into the
+        # front state - no traj_eval back-buffer copy and no flip() needed.
+        # The attitude bookkeeping mirrors _finishTick().
+        i = cf.index
+        state = cf.state
+        roll_prev, pitch_prev, _ = cf.rpy()
+        state.pos = firm.mkvec(
+            self._outPos[i, 0], self._outPos[i, 1], self._outPos[i, 2])
+        state.vel = firm.mkvec(
+            self._outVel[i, 0], self._outVel[i, 1], self._outVel[i, 2])
+        state.acc = firm.mkvec(
+            self._outAcc[i, 0], self._outAcc[i, 1], self._outAcc[i, 2])
+        # For all kernel modes except LOW_POSITION/LOW_VELOCITY, outYaw is
+        # simply the setState yaw the old back-buffer copy inherited.
+        state.yaw = self._outYaw[i]
+        if cf.mode == _MODE_LOW_POSITION:
+            omegaZ = self._outOmegaZ[i]
+        else:
+            omegaZ = self._setOmegaZ[i]
+        roll, pitch, yaw = cf.rpy()
+        state.euler = np.array((roll, pitch, yaw))
+        state.omega = firm.mkvec((roll_prev - roll) / duration,
+                                 (pitch_prev - pitch) / duration,
+                                 omegaZ)
+
+    def _finishTick(self, cf, duration):
+        roll_prev, pitch_prev, _ = np.array(cf.rpy())
+        cf.flip()
+        cf.state.euler = np.array(cf.rpy())
+        omega = np.array([(roll_prev - cf.state.euler[0])/duration, (pitch_prev - cf.state.euler[1])/duration,
+                          cf.state.omega[2]])
+        cf.state.omega = firm.mkvec(*omega)
 
     # should be called "animate" or something
     # but called "sleep" for source-compatibility with real-robot scripts
     def sleep(self, duration):
         # operator // has unexpected (wrong ?) behavior for this calculation.
-        ticks = math.floor((duration + self.sleepResidual) / self.dt)
+        ticks = int(math.floor((duration + self.sleepResidual) / self.dt))
         self.sleepResidual += duration - self.dt * ticks
         assert -1e-9 <= self.sleepResidual < self.dt
 
-        for _ in range(int(ticks)):
-            self.visualizer.update(self.t, self.crazyflies)
-            if self.output:
-                self.output.update(self.t, self.crazyflies)
-            self.step(self.dt)
+        # Each tick refreshes the SoA position cache once and lets both
+        # consumers read it, instead of each doing its own pass of per-CF
+        # SWIG attribute reads; step() reuses the same refresh. The bound
+        # methods are hoisted out of the loop and the no-output case is
+        # specialized, saving the lookups and the branch per tick.
+        refresh = self._refreshPositions
+        visUpdate = self.visualizer.update
+        outUpdate = self.output.update if self.output else None
+        step = self.step
+        crazyflies = self.crazyflies
+        dt = self.dt
+        if outUpdate is None:
+            for _ in range(ticks):
+                refresh()
+                visUpdate(self.t, crazyflies, self.positions)
+                step(dt)
+        else:
+            for _ in range(ticks):
+                refresh()
+                visUpdate(self.t, crazyflies, self.positions)
+                outUpdate(self.t, crazyflies, self.positions)
+                step(dt)
 
     # Mock for abstraction of rospy.Rate.sleep().
     def sleepForRate(self, rate):
@@ -83,8 +448,52 @@ class TimeHelper:
         self.observers.append(observer)
 
 
+def _zeroVec3(v):
+    v.x = 0.0
+    v.y = 0.0
+    v.z = 0.0
+
+
+# Per-mode setpoint_t fillers for collisionAvoidanceUpdateSetpoint, dispatched
+# from a dict instead of a chain of mode comparisons per CF per tick. Every
+# field written by any filler is also reset by the others, so no stale values
+# leak when a scratch setpoint is reused across ticks.
+def _caFillIdle(setpoint, setState):
+    setpoint.mode.x = firm.modeDisable
+    _zeroVec3(setpoint.position)
+    _zeroVec3(setpoint.velocity)
+
+
+def _caFillFullState(setpoint, setState):
+    setpoint.mode.x = firm.modeAbs
+    _copySvecToVec(setpoint.position, setState.pos)
+    _copySvecToVec(setpoint.velocity, setState.vel)
+
+
+def _caFillPosition(setpoint, setState):
+    setpoint.mode.x = firm.modeAbs
+    _copySvecToVec(setpoint.position, setState.pos)
+    _zeroVec3(setpoint.velocity)
+
+
+def _caFillVelocity(setpoint, setState):
+    setpoint.mode.x = firm.modeVelocity
+    _zeroVec3(setpoint.position)
+    _copySvecToVec(setpoint.velocity, setState.vel)
+
+
+_CA_SETPOINT_FILLERS = {
+    _MODE_IDLE: _caFillIdle,
+    _MODE_HIGH_POLY: _caFillFullState,
+    _MODE_LOW_FULLSTATE: _caFillFullState,
+    _MODE_LOW_POSITION: _caFillPosition,
+    _MODE_LOW_VELOCITY: _caFillVelocity,
+}
+
+
 def collisionAvoidanceUpdateSetpoint(
-    collisionParams, collisionState, mode, state, setState, otherCFs):
+    collisionParams, collisionState, mode, state, setState, otherPositions,
+    skipIndex=-1, scratch=None):
     """Modifies a setpoint based on firmware collision-avoidance algorithm.
 
     Main purpose is to hide the firmware's stabilizer_types.h types, because we
@@ -100,57 +509,63 @@ def collisionAvoidanceUpdateSetpoint(
         state (firmware traj_eval): The Crazyflie's currents state.
         setState (firmware traj_eval): The desired state generated by polynomial
             trajectory, user low-level commands, etc.
-        otherCFs (array of Crazyflie): The other Crazyflie objects in the swarm.
+        otherPositions (array float32[3 * nOthers]): Flattened positions of
+            the other CFs in the swarm, gathered from TimeHelper's position
+            cache. With skipIndex >= 0, the positions of *all* CFs including
+            our own.
+        skipIndex (int): If nonnegative, the row of otherPositions holding
+            our own position; the firmware drops it while compacting, so the
+            caller can pass the shared position cache without copying.
+        scratch (tuple, optional): Reusable (state_t, sensorData_t,
+            setpoint_t, traj_eval) firmware objects, overwritten in place.
+            When omitted, fresh objects are allocated; passing the same tuple
+            on every call keeps the steady-state path free of per-tick SWIG
+            object allocations.
 
     Returns:
         newSetState (firmware traj_eval): A new desired state that attempts to
             remain close to setState input while ensuring collision avoidance.
+            When scratch is given, this is the scratch traj_eval; copy it if
+            it must survive the next call.
     """
 
-    # This is significantly faster than calling position() on all the other CFs:
-    # 1.2 vs 1.8 seconds in test_collisionAvoidance.py::test_goToWithCA_random.
-    nOthers = len(otherCFs)
-    otherPositions = np.zeros((nOthers, 3), dtype=np.float32)
-    for i, cf in enumerate(otherCFs):
-        otherPositions[i][0] = cf.state.pos.x
-        otherPositions[i][1] = cf.state.pos.y
-        otherPositions[i][2] = cf.state.pos.z
+    if scratch is None:
+        scratch = (firm.state_t(), firm.sensorData_t(), firm.setpoint_t(),
+                   firm.traj_eval_zero())
+    # sensorData is a dummy - it is accepted to match the API of SitAw, but
+    # it's unused.
+    cmdState, sensorData, setpoint, newSetState = scratch
 
-    cmdState = firm.state_t()
     # Position and velocity are the only states collision avoidance observes.
-    cmdState.position = firm.svec2vec(state.pos)
-    cmdState.velocity = firm.svec2vec(state.vel)
-
-    # Dummy - it accepts the input to match the API of SitAw, but it's unused.
-    sensorData = firm.sensorData_t()
+    _copySvecToVec(cmdState.position, state.pos)
+    _copySvecToVec(cmdState.velocity, state.vel)
 
-    setpoint = firm.setpoint_t()
-    if mode == Crazyflie.MODE_IDLE:
-        pass
-    elif mode in (Crazyflie.MODE_HIGH_POLY, Crazyflie.MODE_LOW_FULLSTATE):
-        setpoint.mode.x = firm.modeAbs
-        setpoint.position = firm.svec2vec(setState.pos)
-        setpoint.velocity = firm.svec2vec(setState.vel)
-    elif mode == Crazyflie.MODE_LOW_POSITION:
-        setpoint.mode.x = firm.modeAbs
-        setpoint.position = firm.svec2vec(setState.pos)
-    elif mode == Crazyflie.MODE_LOW_VELOCITY:
-        setpoint.mode.x = firm.modeVelocity
-        setpoint.velocity = firm.svec2vec(setState.vel)
-    else:
+    try:
+        filler = _CA_SETPOINT_FILLERS[mode]
+    except KeyError:
         raise ValueError("Unknown flight mode.")
-
-    firm.collisionAvoidanceUpdateSetpointWrap(
-        collisionParams,
-        collisionState,
-        otherPositions.flatten(),
-        setpoint,
-        sensorData,
-        cmdState)
-
-    newSetState = firm.traj_eval_zero()
-    newSetState.pos = firm.vec2svec(setpoint.position)
-    newSetState.vel = firm.vec2svec(setpoint.velocity)
+    filler(setpoint, setState)
+
+    if skipIndex >= 0:
+        _caWrapSkip(
+            collisionParams,
+            collisionState,
+            otherPositions,
+            skipIndex,
+            setpoint,
+            sensorData,
+            cmdState)
+    else:
+        firm.collisionAvoidanceUpdateSetpointWrap(
+            collisionParams,
+            collisionState,
+            otherPositions,
+            setpoint,
+            sensorData,
+            cmdState)
+
+    _copyVecToSvec(newSetState.pos, setpoint.position)
+    _copyVecToSvec(newSetState.vel, setpoint.velocity)
     newSetState.yaw = setState.yaw
     newSetState.omega.z = setState.omega[2]
     return newSetState
@@ -159,12 +574,23 @@ def collisionAvoidanceUpdateSetpoint(
 class Crazyflie:
 
     # Flight modes.
-    MODE_IDLE = 0
-    MODE_HIGH_POLY = 1
-    MODE_LOW_FULLSTATE = 2
-    MODE_LOW_POSITION = 3
-    MODE_LOW_VELOCITY = 4
-    MODE_LOW_ACCELERATION = 5
+    MODE_IDLE = _MODE_IDLE
+    MODE_HIGH_POLY = _MODE_HIGH_POLY
+    MODE_LOW_FULLSTATE = _MODE_LOW_FULLSTATE
+    MODE_LOW_POSITION = _MODE_LOW_POSITION
+    MODE_LOW_VELOCITY = _MODE_LOW_VELOCITY
+    MODE_LOW_ACCELERATION = _MODE_LOW_ACCELERATION
+
+    # Maps mode -> name of the bound method that computes the commanded
+    # velocity in integrate(). None for IDLE, which does not integrate.
+    _VELOCITY_FN_NAMES = {
+        _MODE_IDLE: None,
+        _MODE_HIGH_POLY: "_velocityTowardSetpoint",
+        _MODE_LOW_FULLSTATE: "_velocityFromSetpoint",
+        _MODE_LOW_POSITION: "_velocityTowardSetpoint",
+        _MODE_LOW_VELOCITY: "_velocityFromSetpoint",
+        _MODE_LOW_ACCELERATION: "_velocityFromAcceleration",
+    }
 
 
     def __init__(self, id, initialPosition, timeHelper):
@@ -173,14 +599,19 @@ class Crazyflie:
         self.id = id
         self.groupMask = 0
         self.initialPosition = np.array(initialPosition)
-        self.time = lambda: timeHelper.time()
+        self.timeHelper = timeHelper
+        # Row in TimeHelper's SoA arrays. Assigned by CrazyflieServer.
+        self.index = 0
 
         # Commander.
-        self.mode = Crazyflie.MODE_IDLE
+        self._setMode(Crazyflie.MODE_IDLE)
         self.planner = firm.planner()
         firm.plan_init(self.planner)
         self.trajectories = dict()
         self.setState = firm.traj_eval_zero()
+        # Set whenever setState changes, so TimeHelper only re-syncs this CF's
+        # row of the SoA setpoint arrays when needed.
+        self._setStateDirty = True
 
         # State. Public np.array-returning getters below for physics state.
         self.state = firm.traj_eval_zero()
@@ -201,14 +632,56 @@ class Crazyflie:
 
         # For collision avoidance.
         self.otherCFs = []
+        self._otherIndices = None
+        self._otherPosScratch = None
+        self._otherPosFlat = None
+        self._caScratch = None
+        self._caAvoidsWholeSwarm = False
         self.collisionAvoidanceParams = None
         self.collisionAvoidanceState = None
 
     def setGroupMask(self, groupMask):
         self.groupMask = groupMask
 
+    def _setMode(self, mode):
+        # Bind the per-mode velocity computation once at mode-switch time, so
+        # integrate() does a single indirect call instead of re-running a
+        # chain of mode comparisons every tick.
+        try:
+            fnName = Crazyflie._VELOCITY_FN_NAMES[mode]
+        except KeyError:
+            raise ValueError("Unknown flight mode.")
+        self._velocityFn = getattr(self, fnName) if fnName else None
+        self.mode = mode
+
+    def _velocityTowardSetpoint(self, setState, time):
+        return (setState.pos - self.state.pos) / time
+
+    def _velocityFromSetpoint(self, setState, time):
+        return setState.vel
+
+    def _velocityFromAcceleration(self, setState, time):
+        return self.state.vel + time * self.setState.acc
+
     def enableCollisionAvoidance(self, others, ellipsoidRadii, bboxMin=np.repeat(-np.inf, 3), bboxMax=np.repeat(np.inf, 3), horizonSecs=1.0, maxSpeed=2.0):
         self.otherCFs = [cf for cf in others if cf is not self]
+        # Precompute the rows of TimeHelper's position cache to gather each
+        # tick, plus a persistent scratch buffer (and a flat view of it for
+        # the firmware wrapper) so the hot path allocates nothing.
+        self._otherIndices = np.array(
+            [cf.index for cf in self.otherCFs], dtype=np.intp)
+        self._otherPosScratch = np.empty(
+            (len(self.otherCFs), 3), dtype=np.float32)
+        self._otherPosFlat = self._otherPosScratch.reshape(-1)
+        # When avoiding the entire rest of the swarm (the common case), the
+        # firmware can read the shared position cache directly and skip our
+        # own row, so the per-tick gather copy above is not needed at all.
+        self._caAvoidsWholeSwarm = (
+            len(self.otherCFs) == len(self.timeHelper.crazyflies) - 1)
+        # Firmware-side scratch objects, reused in place every tick by
+        # collisionAvoidanceUpdateSetpoint.
+        self._caScratch = (firm.state_t(), firm.sensorData_t(),
+                          firm.setpoint_t(), firm.traj_eval_zero())
 
         # TODO: Accept more of these from arguments.
         params = firm.collision_avoidance_params_t()
@@ -228,26 +701,31 @@ class Crazyflie:
 
     def disableCollisionAvoidance(self):
         self.otherCFs = None
+        self._otherIndices = None
+        self._otherPosScratch = None
+        self._otherPosFlat = None
+        self._caScratch = None
+        self._caAvoidsWholeSwarm = False
         self.collisionAvoidanceParams = None
         self.collisionAvoidanceState = None
 
     def takeoff(self, targetHeight, duration, groupMask = 0):
         if self._isGroup(groupMask):
-            self.mode = Crazyflie.MODE_HIGH_POLY
+            self._setMode(Crazyflie.MODE_HIGH_POLY)
             targetYaw = 0.0
             firm.plan_takeoff(self.planner,
                 self.state.pos, self.state.yaw, targetHeight, targetYaw, duration, self.time())
 
     def land(self, targetHeight, duration, groupMask = 0):
         if self._isGroup(groupMask):
-            self.mode = Crazyflie.MODE_HIGH_POLY
+            self._setMode(Crazyflie.MODE_HIGH_POLY)
             targetYaw = 0.0
             firm.plan_land(self.planner,
                 self.state.pos, self.state.yaw, targetHeight, targetYaw, duration, self.time())
 
     def stop(self, groupMask = 0):
         if self._isGroup(groupMask):
-            self.mode = Crazyflie.MODE_IDLE
+            self._setMode(Crazyflie.MODE_IDLE)
             firm.plan_stop(self.planner)
 
     def goTo(self, goal, yaw, duration, relative = False, groupMask = 0):
@@ -255,7 +733,7 @@ class Crazyflie:
             if self.mode != Crazyflie.MODE_HIGH_POLY:
                 # We need to update to the latest firmware that has go_to_from.
                 raise ValueError("goTo from low-level modes not yet supported.")
-            self.mode = Crazyflie.MODE_HIGH_POLY
+            self._setMode(Crazyflie.MODE_HIGH_POLY)
             firm.plan_go_to(self.planner, relative, firm.mkvec(*goal), yaw, duration, self.time())
 
     def uploadTrajectory(self, trajectoryId, pieceOffset, trajectory):
@@ -263,21 +741,34 @@ class Crazyflie:
         traj.t_begin = 0
         traj.timescale = 1.0
         traj.shift = firm.mkvec(0, 0, 0)
-        traj.n_pieces = len(trajectory.polynomials)
-        traj.pieces = firm.malloc_poly4d(len(trajectory.polynomials))
+        nPieces = len(trajectory.polynomials)
+        traj.n_pieces = nPieces
+        traj.pieces = firm.malloc_poly4d(nPieces)
+        # Marshal all coefficients into one contiguous array and hand it to
+        # the firmware in a single call - per-coefficient poly4d_set cost 32
+        # SWIG calls per piece, which adds up for long trajectories.
+        coefs = np.empty((nPieces, 4, 8), dtype=np.float64)
+        durations = np.empty(nPieces, dtype=np.float64)
         for i, poly in enumerate(trajectory.polynomials):
-            piece = firm.pp_get_piece(traj, i)
-            piece.duration = poly.duration
-            for coef in range(0, 8):
-                firm.poly4d_set(piece, 0, coef, poly.px.p[coef])
-                firm.poly4d_set(piece, 1, coef, poly.py.p[coef])
-                firm.poly4d_set(piece, 2, coef, poly.pz.p[coef])
-                firm.poly4d_set(piece, 3, coef, poly.pyaw.p[coef])
+            coefs[i, 0, :] = poly.px.p
+            coefs[i, 1, :] = poly.py.p
+            coefs[i, 2, :] = poly.pz.p
+            coefs[i, 3, :] = poly.pyaw.p
+            durations[i] = poly.duration
+        if _poly4dSetAll is not None:
+            _poly4dSetAll(traj, coefs.ravel(), durations)
+        else:
+            for i in range(nPieces):
+                piece = firm.pp_get_piece(traj, i)
+                piece.duration = durations[i]
+                for d in range(4):
+                    for c in range(8):
+                        firm.poly4d_set(piece, d, c, coefs[i, d, c])
         self.trajectories[trajectoryId] = traj
 
     def startTrajectory(self, trajectoryId, timescale = 1.0, reverse = False, relative = True, groupMask = 0):
         if self._isGroup(groupMask):
-            self.mode = Crazyflie.MODE_HIGH_POLY
+            self._setMode(Crazyflie.MODE_HIGH_POLY)
             traj = self.trajectories[trajectoryId]
             traj.t_begin = self.time()
             traj.timescale = timescale
@@ -298,9 +789,26 @@ class Crazyflie:
         # simulate this behavior.
         pass
 
+    def time(self):
+        return self.timeHelper.t
+
     def position(self):
         return np.array(self.state.pos)
 
+    # Tuple variants of the state getters below: no ndarray allocation, so
+    # they are preferred for per-tick internal use and high-rate observers.
+    def positionTuple(self):
+        pos = self.state.pos
+        return (pos.x, pos.y, pos.z)
+
+    def velocityTuple(self):
+        vel = self.state.vel
+        return (vel.x, vel.y, vel.z)
+
+    def accelerationTuple(self):
+        acc = self.state.acc
+        return (acc.x, acc.y, acc.z)
+
     def getParam(self, name):
         print("WARNING: getParam not implemented in simulation!")
 
@@ -333,27 +841,20 @@ class Crazyflie:
         return np.array(self.state.omega)
 
     def rpy(self):
-        acc = self.acceleration()
-        yaw = self.yaw()
-        norm = np.linalg.norm(acc)
-        if norm < 1e-6:
-            return (0.0, 0.0, yaw)
-        else:
-            thrust = acc + np.array([0, 0, 9.81])
-            z_body = thrust / np.linalg.norm(thrust)
-            x_world = np.array([math.cos(yaw), math.sin(yaw), 0])
-            y_body = np.cross(z_body, x_world)
-            x_body = np.cross(y_body, z_body)
-            pitch = math.asin(-x_body[2])
-            roll = math.atan2(y_body[2], z_body[2])
-            return (roll, pitch, yaw)
+        acc = self.state.acc
+        return _accYawToRPY(acc.x, acc.y, acc.z, float(self.state.yaw))
 
     def _rpyt2force(self, roll, pitch, yaw, thrust):
         thrust /= 2**16
         total_thrust = self._normalized_pwm2normalized_thrust(thrust)*4  # TODO: Check if result must be multiplied by 4 (4 rotors)
-        R = Rotation.from_euler('xyz', [roll, pitch, yaw], degrees=True).as_matrix()
-
-        return R@np.array([0, 0, total_thrust])
+        # Closed form of Rotation.from_euler('xyz', [roll, pitch, yaw],
+        # degrees=True).as_matrix() @ [0, 0, total_thrust]: only the third
+        # column of the rotation matrix survives, so six trig evaluations
+        # replace the SciPy object construction and the matmul. This runs on
+        # every cmdVel, i.e. potentially every tick.
+        zx, zy, zz = _bodyZAxis(
+            math.radians(roll), math.radians(pitch), math.radians(yaw))
+        return total_thrust * np.array([zx, zy, zz])
 
     def _normalized_pwm2normalized_thrust(self, normalized_pwm, normalized_voltage=0.8, a=-0.18386916161000877,
                                           b=0.5437057173391476,  c=0.22434278175383388, d=-0.037018218629046196,
@@ -361,27 +862,30 @@ class Crazyflie:
         return a + b*normalized_pwm + c*normalized_voltage + d*normalized_pwm**2 + e*normalized_pwm*normalized_voltage
 
     def cmdFullState(self, pos, vel, acc, yaw, omega):
-        self.mode = Crazyflie.MODE_LOW_FULLSTATE
+        self._setMode(Crazyflie.MODE_LOW_FULLSTATE)
         self.setState.pos = firm.mkvec(*pos)
         self.setState.vel = firm.mkvec(*vel)
         self.setState.acc = firm.mkvec(*acc)
         self.setState.yaw = yaw
         self.setState.omega = firm.mkvec(*omega)
+        self._setStateDirty = True
 
     def cmdPosition(self, pos, yaw = 0):
-        self.mode = Crazyflie.MODE_LOW_POSITION
+        self._setMode(Crazyflie.MODE_LOW_POSITION)
         self.setState.pos = firm.mkvec(*pos)
         self.setState.yaw = yaw
+        self._setStateDirty = True
         # TODO: should we set vel, acc, omega to zero, or rely on modes to not read them?
 
     def cmdVelocityWorld(self, vel, yawRate):
-        self.mode = Crazyflie.MODE_LOW_VELOCITY
+        self._setMode(Crazyflie.MODE_LOW_VELOCITY)
         self.setState.vel = firm.mkvec(*vel)
         self.setState.omega = firm.mkvec(0.0, 0.0, yawRate)
+        self._setStateDirty = True
         # TODO: should we set pos, acc, yaw to zero, or rely on modes to not read them?
 
     def cmdVel(self, roll, pitch, yawRate, thrust, yaw=0., g=9.81, m=0.0348, max_thrust_kg=0.057):
-        self.mode = Crazyflie.MODE_LOW_ACCELERATION
+        self._setMode(Crazyflie.MODE_LOW_ACCELERATION)
         total_normalized_force = self._rpyt2force(roll, pitch, yaw, thrust)
         total_force = total_normalized_force*max_thrust_kg*g
         acc = (total_force-np.array([0, 0, m*g]))/m
@@ -389,6 +893,7 @@ class Crazyflie:
         self.setState.acc = firm.mkvec(*acc)
         yawRate_rad = math.radians(yawRate)
         self.setState.omega = firm.mkvec(0.0, 0.0, yawRate_rad)
+        self._setStateDirty = True
 
     def cmdStop(self):
         # TODO: set mode to MODE_IDLE?
@@ -396,41 +901,45 @@ class Crazyflie:
 
     def integrate(self, time, disturbanceSize, maxVel):
         if self.mode == Crazyflie.MODE_HIGH_POLY:
-            self.setState = firm.plan_current_goal(self.planner, self.time())
+            self.setState = firm.plan_current_goal(
+                self.planner, self.timeHelper.t)
 
         if self.collisionAvoidanceState is not None:
+            # Gathering from the position cache is significantly faster than
+            # calling position() on all the other CFs: 1.2 vs 1.8 seconds in
+            # test_collisionAvoidance.py::test_goToWithCA_random. When we
+            # avoid the whole swarm, even the gather copy is skipped: the
+            # firmware reads the cache directly and drops our own row.
+            if self._caAvoidsWholeSwarm and _caWrapSkip is not None:
+                otherPositions = self.timeHelper.positions.ravel()
+                skipIndex = self.index
+            else:
+                np.take(self.timeHelper.positions, self._otherIndices,
+                        axis=0, out=self._otherPosScratch)
+                otherPositions = self._otherPosFlat
+                skipIndex = -1
             setState = collisionAvoidanceUpdateSetpoint(
                 self.collisionAvoidanceParams,
                 self.collisionAvoidanceState,
                 self.mode,
                 self.state,
                 self.setState,
-                self.otherCFs,
+                otherPositions,
+                skipIndex,
+                self._caScratch,
             )
         else:
-            setState = firm.traj_eval(self.setState)
+            # Alias rather than deep-copy: nothing below mutates setState,
+            # and backState deep-copies it before taking ownership.
+            setState = self.setState
 
         if self.mode == Crazyflie.MODE_IDLE:
             return
 
-        if self.mode in (Crazyflie.MODE_HIGH_POLY, Crazyflie.MODE_LOW_POSITION):
-            velocity = (setState.pos - self.state.pos) / time
-        elif self.mode in (Crazyflie.MODE_LOW_VELOCITY, Crazyflie.MODE_LOW_FULLSTATE):
-            velocity = setState.vel
-        elif self.mode == Crazyflie.MODE_LOW_ACCELERATION:
-            velocity = self.state.vel + time*self.setState.acc
-        #elif self.mode == Crazyflie.MODE_LOW_FULLSTATE:
-        #    velocity_tmp = np.array(self.state.vel + time*self.setState.acc)
-
-            # Clip velocity when desired velocity reached:
-            #for ii, (acc_d, vel_d, vel) in enumerate(zip(self.setState.acc, self.setState.vel, velocity_tmp)):
-            #    if acc_d > 0:
-            #        velocity_tmp[ii] = min(vel, vel_d)
-            #    else:
-            #        velocity_tmp[ii] = max(vel, vel_d)
-            #velocity = firm.mkvec(velocity_tmp[0], velocity_tmp[1], velocity_tmp[2])
-        else:
-            raise ValueError("Unknown flight mode.")
+        # Bound by _setMode; see the _velocity* methods above.
+        # TODO(previously inline here): consider clipping LOW_FULLSTATE
+        # velocity toward setState.vel once setState.acc has been integrated.
+        velocity = self._velocityFn(setState, time)
 
         # Limit velocity for realism.
         # Note: This will result in the state having a different velocity than
@@ -438,11 +947,24 @@ class Crazyflie:
         # clamping occurs, because we are essentially getting rid of the
         # feedforward commands. We assume this is not a problem.
 
-        velocity = firm.vclampnorm(velocity, maxVel)
-
-        disturbance = disturbanceSize * np.random.normal(size=3)
-        velocity = velocity + firm.mkvec(*disturbance)
-        self.backState = firm.traj_eval(setState)
+        # With the default maxVel=inf the clamp is a no-op, so skip the call
+        # entirely; otherwise a scalar helper replaces the SWIG roundtrip.
+        if maxVel != np.inf:
+            vx, vy, vz = _vclampnorm3(
+                velocity.x, velocity.y, velocity.z, maxVel)
+            velocity = firm.mkvec(vx, vy, vz)
+
+        noise = self.timeHelper._noiseBuf[self.index]
+        velocity = velocity + firm.mkvec(disturbanceSize * noise[0],
+                                         disturbanceSize * noise[1],
+                                         disturbanceSize * noise[2])
+        # Everything below overwrites pos, vel and acc anyway, so inherit
+        # only yaw/omega (and acc, clobbered next) in place instead of
+        # allocating a fresh traj_eval copy.
+        if _trajEvalCopyKinematic is not None:
+            _trajEvalCopyKinematic(self.backState, setState)
+        else:
+            self.backState = firm.traj_eval(setState)
         self.backState.pos = self.state.pos + time * velocity
         self.backState.vel = velocity
 
@@ -472,6 +994,14 @@ class Crazyflie:
         return groupMask == 0 or (self.groupMask & groupMask) > 0
 
 
+@functools.lru_cache(maxsize=8)
+def _loadCrazyfliesYaml(path, mtime):
+    # mtime is part of the cache key, so editing the file invalidates the
+    # entry. Callers must treat the returned dict as read-only.
+    with open(path, 'r') as ymlfile:
+        return yaml.load(ymlfile, Loader=_YamlSafeLoader)
+
+
 class CrazyflieServer:
     def __init__(self, timeHelper, crazyflies_yaml="../launch/crazyflies.yaml"):
         """Initialize the server.
@@ -483,45 +1013,55 @@ class CrazyflieServer:
                 directly from string.
         """
         if crazyflies_yaml.endswith(".yaml"):
-            with open(crazyflies_yaml, 'r') as ymlfile:
-                cfg = yaml.safe_load(ymlfile)
+            cfg = _loadCrazyfliesYaml(
+                crazyflies_yaml, os.path.getmtime(crazyflies_yaml))
         else:
-            cfg = yaml.safe_load(crazyflies_yaml)
+            cfg = yaml.load(crazyflies_yaml, Loader=_YamlSafeLoader)
 
         self.crazyflies = []
         self.crazyfliesById = dict()
-        for crazyflie in cfg["crazyflies"]:
+        for i, crazyflie in enumerate(cfg["crazyflies"]):
             id = int(crazyflie["id"])
             initialPosition = crazyflie["initialPosition"]
             cf = Crazyflie(id, initialPosition, timeHelper)
+            cf.index = i
             self.crazyflies.append(cf)
             self.crazyfliesById[id] = cf
 
         self.timeHelper = timeHelper
         self.timeHelper.crazyflies = self.crazyflies
+        # Make the position cache valid before the first step().
+        self.timeHelper._refreshPositions()
 
     def emergency(self):
         print("WARNING: emergency not implemented in simulation!")
 
+    def _groupCFs(self, groupMask):
+        # Select the addressed CFs once instead of letting every per-CF call
+        # repeat the _isGroup check. groupMask == 0 means "everyone".
+        if groupMask == 0:
+            return self.crazyflies
+        return [cf for cf in self.crazyflies if cf.groupMask & groupMask]
+
     def takeoff(self, targetHeight, duration, groupMask = 0):
-        for crazyflie in self.crazyflies:
-            crazyflie.takeoff(targetHeight, duration, groupMask)
+        for crazyflie in self._groupCFs(groupMask):
+            crazyflie.takeoff(targetHeight, duration)
 
     def land(self, targetHeight, duration, groupMask = 0):
-        for crazyflie in self.crazyflies:
-            crazyflie.land(targetHeight, duration, groupMask)
+        for crazyflie in self._groupCFs(groupMask):
+            crazyflie.land(targetHeight, duration)
 
     def stop(self, groupMask = 0):
-        for crazyflie in self.crazyflies:
-            crazyflie.stop(groupMask)
+        for crazyflie in self._groupCFs(groupMask):
+            crazyflie.stop()
 
     def goTo(self, goal, yaw, duration, groupMask = 0):
-        for crazyflie in self.crazyflies:
-            crazyflie.goTo(goal, yaw, duration, relative=True, groupMask=groupMask)
+        for crazyflie in self._groupCFs(groupMask):
+            crazyflie.goTo(goal, yaw, duration, relative=True)
 
     def startTrajectory(self, trajectoryId, timescale = 1.0, reverse = False, relative = True, groupMask = 0):
-        for crazyflie in self.crazyflies:
-            crazyflie.startTrajectory(trajectoryId, timescale, reverse, relative, groupMask)
+        for crazyflie in self._groupCFs(groupMask):
+            crazyflie.startTrajectory(trajectoryId, timescale, reverse, relative)
 
     def setParam(self, name, value):
         print("WARNING: setParam not implemented in simulation!")
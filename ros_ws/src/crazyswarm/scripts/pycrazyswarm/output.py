@@ -8,9 +8,12 @@ class Output:
         self.data = dict()
         self.starttime = None
 
-    def update(self, t, crazyflies):
-        for cf in crazyflies:
-            x, y, z = cf.position()
+    def update(self, t, crazyflies, positions=None):
+        for i, cf in enumerate(crazyflies):
+            if positions is not None:
+                x, y, z = positions[i]
+            else:
+                x, y, z = cf.positionTuple()
             roll, pitch, yaw = cf.rpy()
             if cf.id not in self.data:
                 self.data[cf.id] = np.empty((0, 7), float)
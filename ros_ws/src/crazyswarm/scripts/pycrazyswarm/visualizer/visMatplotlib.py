@@ -43,18 +43,15 @@ class VisMatplotlib:
     def showEllipsoids(self, radii):
         warnings.warn("showEllipsoids not implemented in Matplotlib visualizer.")
 
-    def update(self, t, crazyflies):
-        xs = []
-        ys = []
-        zs = []
-        cs = []
-        for cf in crazyflies:
-            x, y, z = cf.position()
-            color = cf.ledRGB
-            xs.append(x)
-            ys.append(y)
-            zs.append(z)
-            cs.append(color)
+    def update(self, t, crazyflies, positions=None):
+        # The simulation passes its SoA position cache; fall back to per-CF
+        # queries when called without it.
+        if positions is None:
+            positions = np.array([cf.positionTuple() for cf in crazyflies])
+        xs = positions[:, 0]
+        ys = positions[:, 1]
+        zs = positions[:, 2]
+        cs = [cf.ledRGB for cf in crazyflies]
 
         if self.plot is None:
             self.plot = self.ax.scatter(xs, ys, zs, c=cs)
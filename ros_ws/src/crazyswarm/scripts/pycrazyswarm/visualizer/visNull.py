@@ -10,5 +10,5 @@ class VisNull:
     def showEllipsoids(self, radii):
         pass
 
-    def update(self, t, crazyflies):
+    def update(self, t, crazyflies, positions=None):
         pass
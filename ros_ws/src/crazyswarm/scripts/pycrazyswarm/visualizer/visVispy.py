@@ -74,7 +74,7 @@ class VisVispy:
     def showEllipsoids(self, radii):
         self.ellipsoid_radii = np.array(radii)
 
-    def update(self, t, crazyflies):
+    def update(self, t, crazyflies, positions=None):
         if len(self.cfs) == 0:
             verts, faces, normals, nothin = io.read_mesh(CF_MESH_PATH)
             for i, cf in enumerate(crazyflies):
@@ -110,10 +110,12 @@ class VisVispy:
                 ell.ambient_light_color = [0.5] * 3
                 ell.transform = transforms.MatrixTransform()
 
-        positions = np.stack([cf.position() for cf in crazyflies])
+        # The simulation passes its SoA position cache; fall back to per-CF
+        # queries when called without it.
+        if positions is None:
+            positions = np.array([cf.positionTuple() for cf in crazyflies])
 
         for i in range(0, len(self.cfs)):
-            x, y, z = crazyflies[i].position()
             roll, pitch, yaw = crazyflies[i].rpy()
             self.cfs[i].transform.reset()
             self.cfs[i].transform.rotate(-90, (1, 0, 0))